@@ -1,21 +1,26 @@
 #!/usr/bin/env python3
 
-from collections import OrderedDict
 import itertools
+import sys
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    TextIO,
+    Tuple,
+    TypeVar,
+)
 from dataclasses import dataclass
 
-
-@dataclass
-class LinkMapLine:
-    vma: str
-    lma: str
-    size: str
-    align: str
-    out: str
-    in_: str
-    symbol: str
+try:
+    # Optional compiled row loop, built with `cythonize -i link_map_parse.pyx`
+    from link_map_parse import parse_rows
+except ImportError:
+    parse_rows = None
 
 
 def assert_equal(a: List[str], b: List[str]):
@@ -26,126 +31,43 @@ def parse_space_separated(l) -> List[str]:
     return [a for a in l.split(" ") if a]
 
 
-def parse_positional(l: str, idx: int) -> str:
-    a = l[idx:]
-    if a and a[0] != " ":
-        a = a.strip()
-    else:
-        a = ""
-    return a
-
-
-def tokenize_link_map(content: str) -> List[LinkMapLine]:
-    lines = content.splitlines()
-    while not lines[0]:
-        lines = lines[1:]
-    heading_line = lines[0]
-    heading = parse_space_separated(heading_line)
-    assert_equal(heading, ["VMA", "LMA", "Size", "Align", "Out", "In", "Symbol"])
-    out_idx = heading_line.find("Out")
-    assert out_idx > 0
-    in_idx = heading_line.find("In")
-    assert in_idx > 0
-    symbol_idx = heading_line.find("Symbol")
-    assert symbol_idx > 0
-    elems = []
-    for line in lines[1:]:
-        regular = parse_space_separated(line[:out_idx])
-        out = parse_positional(line, out_idx)
-        in_ = parse_positional(line, in_idx)
-        symbol = parse_positional(line, symbol_idx)
-        elem = LinkMapLine(
-            vma=regular[0],
-            lma=regular[1],
-            size=regular[2],
-            align=regular[3],
-            out=out,
-            in_=in_,
-            symbol=symbol,
-        )
-        elems.append(elem)
-    return elems
-
-
+# Mixins have empty __slots__ so that the slotted nodes below carry no __dict__.
 @dataclass
 class Named:
+    __slots__ = ()
     name: str
 
 
 @dataclass
 class Sized:
+    __slots__ = ()
     vma: int
     lma: int
     size: int
     align: int
 
 
-@dataclass
+@dataclass(slots=True)
 class Symbol(Named, Sized):
     pass
 
 
-@dataclass
+@dataclass(slots=True)
 class SectionIn(Named, Sized):
     children: List[Symbol]
 
 
-@dataclass
+@dataclass(slots=True)
 class SectionOut(Named, Sized):
     children: List[SectionIn]
 
 
-def build_tree(elems: List[LinkMapLine]) -> List[SectionOut]:
-    section_out: Optional[SectionOut] = None
-    section_in: Optional[SectionIn] = None
-    assert len(elems[0].out)
-    sections_out: List[SectionOut] = []
-    sections_in: List[SectionOut] = []
-    symbols: List[Symbol] = []
-
-    for elem in elems:
-        if elem.out:
-            # New out section
-            section_out = SectionOut(
-                name=elem.out,
-                vma=int(elem.vma, base=16),
-                lma=int(elem.lma, base=16),
-                size=int(elem.size, base=16),
-                align=int(elem.align, base=16),
-                children=[],
-            )
-            sections_out.append(section_out)
-            sections_in = section_out.children
-            continue
-        if elem.in_:
-            # New in section
-            section_in = SectionIn(
-                name=elem.in_,
-                vma=int(elem.vma, base=16),
-                lma=int(elem.lma, base=16),
-                size=int(elem.size, base=16),
-                align=int(elem.align, base=16),
-                children=[],
-            )
-            sections_in.append(section_in)
-            symbols = section_in.children
-            continue
-        # Add symbol
-        symbols.append(
-            Symbol(
-                vma=int(elem.vma, base=16),
-                lma=int(elem.lma, base=16),
-                size=int(elem.size, base=16),
-                align=int(elem.align, base=16),
-                name=elem.symbol,
-            )
-        )
-    return sections_out
-
-
-def parse_link_map(content: str) -> List[SectionOut]:
+def parse_link_map(lines: Iterable[str]) -> List[SectionOut]:
     """
-    Parse the content of a space-separated link map file into a tree.
+    Parse the lines of a space-separated link map file into a tree.
+    Lines are consumed one at a time, so an open file may be passed directly.
+    The row loop is duplicated in link_map_parse.pyx, which is used instead when
+    built; the two must be kept in sync.
 
     >>> content = '''
     ...          VMA              LMA     Size Align Out     In      Symbol
@@ -158,7 +80,7 @@ def parse_link_map(content: str) -> List[SectionOut]:
     ...         18c0             18c0       1c     1                 vtable for FOO
     ...         18c0             18c0       1c     1                 vtable for BAR
     ... '''
-    >>> tree = parse_link_map(content)
+    >>> tree = parse_link_map(content.splitlines())
     >>> len(tree)
     3
     >>> tree[0].name
@@ -178,8 +100,79 @@ def parse_link_map(content: str) -> List[SectionOut]:
     >>> tree[2].children[1].children[1]
     Symbol(vma=6336, lma=6336, size=28, align=1, name='vtable for BAR')
     """
-    elems = tokenize_link_map(content)
-    return build_tree(elems)
+    lines = iter(lines)
+    heading_line = ""
+    while not heading_line:
+        line = next(lines, None)
+        if line is None:
+            raise ValueError("Missing link map header")
+        heading_line = line.rstrip()
+    heading = parse_space_separated(heading_line)
+    assert_equal(heading, ["VMA", "LMA", "Size", "Align", "Out", "In", "Symbol"])
+    out_idx = heading_line.find("Out")
+    assert out_idx > 0
+    in_idx = heading_line.find("In")
+    assert in_idx > 0
+    symbol_idx = heading_line.find("Symbol")
+    assert symbol_idx > 0
+    if parse_rows is not None:
+        return parse_rows(
+            lines, out_idx, in_idx, symbol_idx, SectionOut, SectionIn, Symbol
+        )
+
+    # The loop runs once per line, so bind the constructors to locals and
+    # call them positionally: (vma, lma, size, align, name[, children])
+    new_section_out = SectionOut
+    new_section_in = SectionIn
+    new_symbol = Symbol
+    intern = sys.intern
+
+    sections_out: List[SectionOut] = []
+    sections_in: Optional[List[SectionIn]] = None
+    symbols: Optional[List[Symbol]] = None
+    for line in lines:
+        if not line or line.isspace():
+            continue
+        vma, lma, size, align = line[:out_idx].split()
+        vma = int(vma, base=16)
+        lma = int(lma, base=16)
+        size = int(size, base=16)
+        align = int(align, base=16)
+        if line[out_idx] != " ":
+            # New out section
+            section_out = new_section_out(
+                vma, lma, size, align, intern(line[out_idx:].strip()), []
+            )
+            sections_out.append(section_out)
+            sections_in = section_out.children
+            continue
+        assert sections_in is not None, "Expected an out section first"
+        if line[in_idx] != " ":
+            # New in section
+            section_in = new_section_in(
+                vma, lma, size, align, intern(line[in_idx:].strip()), []
+            )
+            sections_in.append(section_in)
+            symbols = section_in.children
+            continue
+        assert symbols is not None, "Expected an in section first"
+        # Add symbol
+        symbols.append(
+            new_symbol(vma, lma, size, align, intern(line[symbol_idx:].strip()))
+        )
+    return sections_out
+
+
+def open_link_map(path: str) -> TextIO:
+    """
+    Open a link map file with a large buffer, since they can be many megabytes.
+    """
+    return open(path, "r", buffering=1 << 20, encoding="utf-8", errors="replace")
+
+
+# Separates the object file from the section in the name of an IN section, as in
+# "foo.cc.o:(.text._Z3foov)"
+OBJECT_SECTION_SEPARATOR = ".o:("
 
 
 def merge_function_sections(sections: List[SectionIn]) -> List[SectionIn]:
@@ -195,7 +188,7 @@ def merge_function_sections(sections: List[SectionIn]) -> List[SectionIn]:
     ...          108              108        8     1         bar.cc.o:(.text._BAR)
     ...          108              108        8     1                 BAR
     ... '''
-    >>> tree = parse_link_map(content)
+    >>> tree = parse_link_map(content.splitlines())
     >>> before = tree[0].children
     >>> len(before)
     2
@@ -203,76 +196,143 @@ def merge_function_sections(sections: List[SectionIn]) -> List[SectionIn]:
     >>> len(merged)
     1
     >>> merged[0]
-    SectionIn(vma=256, lma=256, size=16, align=8, name='bar.cc.o', children=[Symbol(vma=256, lma=256, size=8, align=1, name='FOO'), Symbol(vma=264, lma=264, size=8, align=1, name='BAR')])
+    SectionIn(vma=256, lma=256, size=16, align=1, name='bar.cc.o', children=[Symbol(vma=256, lma=256, size=8, align=1, name='FOO'), Symbol(vma=264, lma=264, size=8, align=1, name='BAR')])
     """
 
-    def strip_function_name(name: str):
-        idx = name.find(".o:(")
-        if idx == -1:
-            return name
-        return name[: idx + 2]
-
-    merged_sections: Dict[str, SectionIn] = OrderedDict()
+    groups: Dict[str, List[SectionIn]] = {}
+    # Sections from the same object file are usually adjacent, so remember the
+    # last object file prefix and reuse its name while sections keep matching it
+    last_prefix: Optional[str] = None
+    last_name = ""
     for section in sections:
-        name = strip_function_name(section.name)
-        if name not in merged_sections:
-            merged_sections[name] = SectionIn(
-                vma=section.vma,
-                lma=section.lma,
-                size=0,
-                align=0,
+        # Strip the function name, keeping the object file
+        if last_prefix is not None and section.name.startswith(last_prefix):
+            name = last_name
+        else:
+            idx = section.name.find(OBJECT_SECTION_SEPARATOR)
+            if idx == -1:
+                name = section.name
+            else:
+                last_prefix = section.name[: idx + len(OBJECT_SECTION_SEPARATOR)]
+                last_name = name = sys.intern(section.name[: idx + 2])
+        group = groups.get(name)
+        if group is None:
+            groups[name] = [section]
+        else:
+            group.append(section)
+
+    merged_sections: List[SectionIn] = []
+    for name, group in groups.items():
+        children = list(itertools.chain.from_iterable(s.children for s in group))
+        # Sections are listed in address order, so the first one has the
+        # addresses of the merged section
+        merged_sections.append(
+            SectionIn(
+                vma=group[0].vma,
+                lma=group[0].lma,
+                size=sum(s.size for s in group),
+                align=max(s.align for s in group),
                 name=name,
-                children=[],
+                children=children,
             )
-        merged_section = merged_sections[name]
-        merged_section.vma = min(merged_section.vma, section.vma)
-        merged_section.lma = min(merged_section.lma, section.lma)
-        merged_section.size += section.size
-        merged_section.align = max(merged_section.align, section.size)
-        merged_section.children.extend(section.children)
+        )
+    return merged_sections
+
 
-    return list(merged_sections.values())
+def load_link_map(path: str) -> List[SectionOut]:
+    """
+    Parse the link map file at `path`, merging the function sections of each
+    output section.
+    """
+    with open_link_map(path) as f:
+        tree = parse_link_map(f)
+    for e in tree:
+        e.children = merge_function_sections(e.children)
+    return tree
 
 
 @dataclass
 class DiffSized:
+    __slots__ = ()
     sizes: List[int]
     delta: int
 
 
-@dataclass
+@dataclass(slots=True)
 class DiffSymbol(DiffSized, Named):
     pass
 
 
-@dataclass
+@dataclass(slots=True)
 class DiffSectionIn(DiffSized, Named):
     children: List[DiffSymbol]
 
 
-@dataclass
+@dataclass(slots=True)
 class DiffSectionOut(DiffSized, Named):
     children: List[DiffSectionIn]
 
 
+T = TypeVar("T", Symbol, SectionIn, SectionOut)
+
+
+def match_by_name(
+    a: List[T], b: List[T], absent: Callable[[str], T]
+) -> Iterator[Tuple[str, T, T]]:
+    """
+    Pair up the elements of two lists by name, in order of first appearance in
+    `a` followed by the names only present in `b`. When a name appears more than
+    once in a list, the last element with that name is used. A missing
+    counterpart is created by calling `absent` with the name.
+
+    >>> a = [Symbol(vma=0, lma=0, size=1, align=1, name=n) for n in "xyx"]
+    >>> b = [Symbol(vma=0, lma=0, size=2, align=1, name=n) for n in "zx"]
+    >>> def absent(name):
+    ...     return None
+    >>> [(name, e_a and e_a.size, e_b and e_b.size)
+    ...  for name, e_a, e_b in match_by_name(a, b, absent)]
+    [('x', 1, 2), ('y', 1, None), ('z', None, 2)]
+    >>> [name for name, _, _ in match_by_name(a[:1], b[1:], absent)]
+    ['x']
+    >>> [name for name, _, _ in match_by_name(a[1:2], b[1:], absent)]
+    ['y', 'x']
+    >>> [name for name, _, _ in match_by_name([], b, absent)]
+    ['z', 'x']
+    """
+    # Sections commonly hold a single symbol, so pair those up without building
+    # dictionaries.
+    if len(a) == 1 and len(b) == 1:
+        e_a, e_b = a[0], b[0]
+        if e_a.name == e_b.name:
+            yield e_a.name, e_a, e_b
+        else:
+            yield e_a.name, e_a, absent(e_a.name)
+            yield e_b.name, absent(e_b.name), e_b
+        return
+    names_a: Dict[str, T] = {e.name: e for e in a}
+    names_b: Dict[str, T] = {e.name: e for e in b}
+    for name, e_a in names_a.items():
+        e_b = names_b.pop(name, None)
+        yield name, e_a, absent(name) if e_b is None else e_b
+    for name, e_b in names_b.items():
+        yield name, absent(name), e_b
+
+
 def diff_symbols(a: List[Symbol], b: List[Symbol]) -> List[DiffSymbol]:
-    # Make a dictionary of {names: (a, b)}
-    # For each item, record the difference, and compare the children
-    union: Dict[str, Tuple[Symbol, Symbol]] = OrderedDict()
-    names_a: Dict[str, Symbol] = {e.name: e for e in a}
-    names_b: Dict[str, Symbol] = {e.name: e for e in b}
-    for name in itertools.chain(names_a.keys(), names_b.keys()):
-        if name in union:
-            continue
-        e_a = names_a.get(name)
-        if e_a is None:
-            e_a = Symbol(vma=0, lma=0, size=0, align=0, name=name)
-        e_b = names_b.get(name)
-        if e_b is None:
-            e_b = Symbol(vma=0, lma=0, size=0, align=0, name=name)
-        union[name] = (e_a, e_b)
+    # Symbols have no children, so beyond single symbols it is cheaper to join
+    # on their sizes alone than to pair up Symbol objects
+    if len(a) + len(b) > 2:
+        return diff_symbol_sizes(
+            {e.name: e.size for e in a}, {e.name: e.size for e in b}
+        )
+
+    # For each pair of elements with the same name, record the difference, and
+    # compare the children
+    def absent(name: str) -> Symbol:
+        return Symbol(vma=0, lma=0, size=0, align=0, name=name)
+
     diff: List[DiffSymbol] = []
-    for name, (e_a, e_b) in union.items():
+    for name, e_a, e_b in match_by_name(a, b, absent):
         if e_a.size == e_b.size:
             continue
         diff.append(
@@ -285,24 +345,43 @@ def diff_symbols(a: List[Symbol], b: List[Symbol]) -> List[DiffSymbol]:
     return diff
 
 
-def diff_section_in(a: List[SectionIn], b: List[SectionIn]) -> List[DiffSectionIn]:
-    # Make a dictionary of {names: (a, b)}
-    # For each item, record the difference, and compare the children
-    union: Dict[str, Tuple[SectionIn, SectionIn]] = OrderedDict()
-    names_a: Dict[str, SectionIn] = {e.name: e for e in a}
-    names_b: Dict[str, SectionIn] = {e.name: e for e in b}
-    for name in itertools.chain(names_a.keys(), names_b.keys()):
-        if name in union:
+def diff_symbol_sizes(
+    sizes_a: Dict[str, int], sizes_b: Dict[str, int]
+) -> List[DiffSymbol]:
+    """
+    Compare two {name: size} maps of symbols. Symbols missing from one side are
+    taken to have zero size. `sizes_b` is consumed.
+
+    >>> diff_symbol_sizes({"x": 1, "y": 2, "z": 3}, {"w": 4, "y": 2, "x": 5})
+    [DiffSymbol(name='x', sizes=[1, 5], delta=4), DiffSymbol(name='z', sizes=[3, 0], delta=-3), DiffSymbol(name='w', sizes=[0, 4], delta=4)]
+    """
+    diff: List[DiffSymbol] = []
+    for name, size_a in sizes_a.items():
+        size_b = sizes_b.pop(name, 0)
+        if size_a == size_b:
+            continue
+        diff.append(
+            DiffSymbol(
+                sizes=[size_a, size_b],
+                delta=size_b - size_a,
+                name=name,
+            )
+        )
+    for name, size_b in sizes_b.items():
+        if size_b == 0:
             continue
-        e_a = names_a.get(name)
-        if e_a is None:
-            e_a = SectionIn(vma=0, lma=0, size=0, align=0, name=name, children=[])
-        e_b = names_b.get(name)
-        if e_b is None:
-            e_b = SectionIn(vma=0, lma=0, size=0, align=0, name=name, children=[])
-        union[name] = (e_a, e_b)
+        diff.append(DiffSymbol(sizes=[0, size_b], delta=size_b, name=name))
+    return diff
+
+
+def diff_section_in(a: List[SectionIn], b: List[SectionIn]) -> List[DiffSectionIn]:
+    # For each pair of elements with the same name, record the difference, and
+    # compare the children
+    def absent(name: str) -> SectionIn:
+        return SectionIn(vma=0, lma=0, size=0, align=0, name=name, children=[])
+
     diff: List[DiffSectionIn] = []
-    for name, (e_a, e_b) in union.items():
+    for name, e_a, e_b in match_by_name(a, b, absent):
         if e_a.size == e_b.size:
             continue
         diff.append(
@@ -321,6 +400,8 @@ def diff_link_map(a: List[SectionOut], b: List[SectionOut]) -> List[DiffSectionO
     Compare the member sizes between two link maps, and output the differences.
     When comparing across link maps, members are identified by their name.
     Deltas are all computed relative to the first link map.
+    Members whose sizes are unchanged are skipped without comparing their
+    children, so mostly unchanged link maps are cheap to compare.
 
     >>> content_a = '''
     ...          VMA              LMA     Size Align Out     In      Symbol
@@ -335,31 +416,37 @@ def diff_link_map(a: List[SectionOut], b: List[SectionOut]) -> List[DiffSectionO
     ...          2a8              2a8       20     1         bar
     ...          2b0              2b0       40     4 baz
     ... '''
-    >>> diff = diff_link_map(parse_link_map(content_a), parse_link_map(content_b))
+    >>> tree_a = parse_link_map(content_a.splitlines())
+    >>> tree_b = parse_link_map(content_b.splitlines())
+    >>> diff = diff_link_map(tree_a, tree_b)
     >>> diff[0]
     DiffSectionOut(name='foo', sizes=[8, 16], delta=8, children=[DiffSectionIn(name='bar', sizes=[8, 32], delta=24, children=[])])
     >>> diff[1]
     DiffSectionOut(name='baz', sizes=[18, 64], delta=46, children=[])
     >>> diff[2]
     DiffSectionOut(name='new', sizes=[10, 0], delta=-10, children=[])
+
+    Sizes moving between the children of a member of unchanged size are not
+    reported.
+
+    >>> content_c = '''
+    ...          VMA              LMA     Size Align Out     In      Symbol
+    ...          2a8              2a8       10     1 foo
+    ...          2a8              2a8        8     1         bar
+    ...          2b0              2b0        8     1         qux
+    ... '''
+    >>> tree_c = parse_link_map(content_c.splitlines())
+    >>> diff_link_map(tree_b, tree_c)
+    [DiffSectionOut(name='baz', sizes=[64, 0], delta=-64, children=[])]
     """
-    # Make a dictionary of {names: (a, b)}
-    # For each item, record the difference, and compare the children
-    union: Dict[str, Tuple[SectionOut, SectionOut]] = OrderedDict()
-    names_a: Dict[str, SectionOut] = {e.name: e for e in a}
-    names_b: Dict[str, SectionOut] = {e.name: e for e in b}
-    for name in itertools.chain(names_a.keys(), names_b.keys()):
-        if name in union:
-            continue
-        e_a = names_a.get(name)
-        if e_a is None:
-            e_a = SectionOut(vma=0, lma=0, size=0, align=0, name=name, children=[])
-        e_b = names_b.get(name)
-        if e_b is None:
-            e_b = SectionOut(vma=0, lma=0, size=0, align=0, name=name, children=[])
-        union[name] = (e_a, e_b)
+
+    # For each pair of elements with the same name, record the difference, and
+    # compare the children
+    def absent(name: str) -> SectionOut:
+        return SectionOut(vma=0, lma=0, size=0, align=0, name=name, children=[])
+
     diff: List[DiffSectionOut] = []
-    for name, (e_a, e_b) in union.items():
+    for name, e_a, e_b in match_by_name(a, b, absent):
         if e_a.size == e_b.size:
             continue
         diff.append(
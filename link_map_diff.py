@@ -2,8 +2,8 @@
 
 import argparse
 import pprint
-from pathlib import Path
-from link_map import merge_function_sections, parse_link_map, diff_link_map
+import sys
+from link_map import diff_link_map, load_link_map
 
 
 def main():
@@ -11,14 +11,17 @@ def main():
     parser.add_argument("path_a", type=str, help="Path to first link map")
     parser.add_argument("path_b", type=str, help="Path to second link map")
     args = parser.parse_args()
-    tree_a = parse_link_map(Path(args.path_a).read_text())
-    tree_b = parse_link_map(Path(args.path_b).read_text())
-    for e in tree_a:
-        e.children = merge_function_sections(e.children)
-    for e in tree_b:
-        e.children = merge_function_sections(e.children)
+    # Both link maps are loaded in this process: sending a parsed tree back
+    # from a worker process costs more than parsing it
+    tree_a = load_link_map(args.path_a)
+    tree_b = load_link_map(args.path_b)
     diff = diff_link_map(tree_a, tree_b)
-    pprint.pprint(diff)
+    # pprint checks whether an object fits on a line by formatting all of it, so
+    # print one top-level entry at a time through a large output buffer
+    with open(sys.stdout.fileno(), "w", buffering=1 << 20, closefd=False) as out:
+        printer = pprint.PrettyPrinter(stream=out)
+        for e in diff:
+            printer.pprint(e)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,120 @@
+# cython: language_level=3
+"""
+Compiled version of the row loop in link_map.parse_link_map.
+
+Build it in place with `cythonize -i link_map_parse.pyx`. link_map falls back
+to the pure Python loop when this module is not built.
+"""
+
+import sys
+
+from libc.stdint cimport uint8_t, uint64_t
+
+cdef object intern = sys.intern
+
+# Value of each hex digit, and INVALID for every other byte
+cdef enum:
+    INVALID = 0xFF
+cdef uint8_t hex_lut[256]
+hex_lut[:] = [INVALID] * 256
+for _i in range(10):
+    hex_lut[ord("0") + _i] = _i
+for _i in range(6):
+    hex_lut[ord("a") + _i] = 10 + _i
+    hex_lut[ord("A") + _i] = 10 + _i
+
+
+cdef int parse_hex_columns(const uint8_t* p, const uint8_t* end, uint64_t* columns):
+    """
+    Parse four space-separated hex numbers between `p` and `end` into `columns`.
+    Returns -1 if the text does not hold exactly four hex numbers.
+    """
+    cdef int i
+    cdef uint8_t digit
+    cdef uint64_t value
+    for i in range(4):
+        while p < end and p[0] == b" ":
+            p += 1
+        if p == end or hex_lut[p[0]] == INVALID:
+            return -1
+        value = 0
+        while p < end:
+            digit = hex_lut[p[0]]
+            if digit == INVALID:
+                break
+            value = (value << 4) | digit
+            p += 1
+        columns[i] = value
+    while p < end and p[0] == b" ":
+        p += 1
+    return 0 if p == end else -1
+
+
+def parse_rows(
+    lines,
+    Py_ssize_t out_idx,
+    Py_ssize_t in_idx,
+    Py_ssize_t symbol_idx,
+    SectionOut,
+    SectionIn,
+    Symbol,
+):
+    """
+    Build the section tree from the lines following the link map header. The
+    node classes are passed in to avoid a circular import of link_map.
+    """
+    cdef list sections_out = []
+    cdef list sections_in = None
+    cdef list symbols = None
+    cdef uint64_t columns[4]
+    cdef bytes numbers
+    cdef const uint8_t* p
+    cdef str line
+
+    for line in lines:
+        if not line or line.isspace():
+            continue
+        # VMA, LMA, Size and Align are right-aligned hex numbers before Out
+        numbers = line[:out_idx].encode("ascii")
+        p = numbers
+        if parse_hex_columns(p, p + len(numbers), columns):
+            raise ValueError(f"Expected four hex numbers in {line!r}")
+        if line[out_idx] != " ":
+            # New out section
+            section_out = SectionOut(
+                columns[0],
+                columns[1],
+                columns[2],
+                columns[3],
+                intern(line[out_idx:].strip()),
+                [],
+            )
+            sections_out.append(section_out)
+            sections_in = section_out.children
+            continue
+        assert sections_in is not None, "Expected an out section first"
+        if line[in_idx] != " ":
+            # New in section
+            section_in = SectionIn(
+                columns[0],
+                columns[1],
+                columns[2],
+                columns[3],
+                intern(line[in_idx:].strip()),
+                [],
+            )
+            sections_in.append(section_in)
+            symbols = section_in.children
+            continue
+        assert symbols is not None, "Expected an in section first"
+        # Add symbol
+        symbols.append(
+            Symbol(
+                columns[0],
+                columns[1],
+                columns[2],
+                columns[3],
+                intern(line[symbol_idx:].strip()),
+            )
+        )
+    return sections_out
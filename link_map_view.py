@@ -2,17 +2,21 @@
 
 import argparse
 import pprint
-from pathlib import Path
-from link_map import parse_link_map
+import sys
+from link_map import parse_link_map, open_link_map
 
 
 def main():
     parser = argparse.ArgumentParser("Link map viewer")
     parser.add_argument("path", type=str, help="Path to link map")
     args = parser.parse_args()
-    tree = parse_link_map(Path(args.path).read_text())
-    for t in tree:
-        pprint.pprint(t)
+    with open_link_map(args.path) as f:
+        tree = parse_link_map(f)
+    # Print through a large output buffer to batch writes
+    with open(sys.stdout.fileno(), "w", buffering=1 << 20, closefd=False) as out:
+        printer = pprint.PrettyPrinter(stream=out)
+        for t in tree:
+            printer.pprint(t)
 
 
 if __name__ == "__main__":